@@ -1,23 +1,44 @@
 import os
-import json
+import re
+import hashlib
 import logging
+import queue
+import time
+import atexit
+import asyncio
+from collections import OrderedDict
 from datetime import datetime
 from flask import Flask, request, jsonify
-import requests
+import httpx
+import orjson
 import google.generativeai as genai
-from groq import Groq
-import sqlite3
+from groq import AsyncGroq
+import threading
 from threading import Thread
-from twilio.rest import Client
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from db import connect_db, get_read_conn, init_db
+from json_provider import OrjsonProvider
 
-# Configure logging to be detailed
+try:
+    import fasttext
+except ImportError:
+    fasttext = None
+
+try:
+    import gcld3
+except ImportError:
+    gcld3 = None
+
+# Configure logging to be detailed; set LOG_LEVEL=WARNING in production to
+# skip formatting the per-message INFO lines
 logging.basicConfig(
-    level=logging.INFO,
+    level=os.environ.get('LOG_LEVEL', 'INFO').upper(),
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
 )
 logger = logging.getLogger(__name__)
 
 app = Flask(__name__)
+app.json = OrjsonProvider(app)
 
 # --- Configuration ---
 class Config:
@@ -30,99 +51,179 @@ class Config:
     GEMINI_API_KEY = os.environ.get('GEMINI_API_KEY')
     GROQ_API_KEY = os.environ.get('GROQ_API_KEY')
     PERPLEXITY_API_KEY = os.environ.get('PERPLEXITY_API_KEY')
+
+    # Optional path to a fastText language-ID model (e.g. lid.176.ftz)
+    LANGUAGE_ID_MODEL = os.environ.get('LANGUAGE_ID_MODEL')
     
     # App Settings
     DATABASE_URL = os.environ.get('DATABASE_URL', 'sqlite:///health_bot.db')
     SECRET_KEY = os.environ.get('SECRET_KEY', 'your-secret-key-here')
+    WORKER_THREADS = int(os.environ.get('WORKER_THREADS', 32))
+    MESSAGE_DEBOUNCE_SECONDS = float(os.environ.get('MESSAGE_DEBOUNCE_SECONDS', 2.0))
+    # Outbound messages per second for this process; keep workers x rate under
+    # the provider limit (Meta allows 80 mps per business number)
+    SEND_RATE_LIMIT = float(os.environ.get('SEND_RATE_LIMIT', 20))
 
 app.config.from_object(Config)
 logger.info("Configuration loaded.")
 
 # --- Initialize Clients ---
-twilio_client = None
+# Connection pool settings shared by the sync and async HTTP clients. They go
+# on the transports: httpx ignores a client's limits= once it is given its own
+# transport. Connect failures are retried at the transport level (the request
+# never left, so this is always safe), and the short connect timeout fails
+# fast on a dead host.
+HTTP_TIMEOUT = httpx.Timeout(30.0, connect=3.05)
+HTTP_LIMITS = httpx.Limits(max_connections=64, max_keepalive_connections=16)
+HTTP_CONNECT_RETRIES = 3
+
+# Shared client for synchronous outbound HTTPS; every Twilio send reuses its
+# connection pool instead of going through the SDK's own per-call plumbing.
+_http = httpx.Client(timeout=HTTP_TIMEOUT,
+                     transport=httpx.HTTPTransport(limits=HTTP_LIMITS, retries=HTTP_CONNECT_RETRIES))
+atexit.register(_http.close)
+
+# Shared async client for Perplexity and Groq. HTTP/2 multiplexes concurrent
+# requests to the same API over one connection instead of opening one each.
+_async_http = httpx.AsyncClient(timeout=HTTP_TIMEOUT,
+                                transport=httpx.AsyncHTTPTransport(limits=HTTP_LIMITS, retries=HTTP_CONNECT_RETRIES, http2=True))
+
+twilio_messages_url = None
 if Config.TWILIO_ACCOUNT_SID and Config.TWILIO_AUTH_TOKEN:
-    try:
-        twilio_client = Client(Config.TWILIO_ACCOUNT_SID, Config.TWILIO_AUTH_TOKEN)
-        logger.info("Twilio client initialized successfully.")
-    except Exception as e:
-        logger.error(f"Failed to initialize Twilio client: {e}")
+    twilio_messages_url = f"https://api.twilio.com/2010-04-01/Accounts/{Config.TWILIO_ACCOUNT_SID}/Messages.json"
+    logger.info("Twilio REST client configured successfully.")
 else:
     logger.warning("Twilio credentials not set. WhatsApp features will be disabled.")
 
 gemini_model = None
 groq_client = None
+_gemini_models = {}
 try:
     if Config.GEMINI_API_KEY:
         genai.configure(api_key=Config.GEMINI_API_KEY)
-        gemini_model = genai.GenerativeModel('gemini-2.5-flash')
+        gemini_model = _gemini_models['gemini-2.5-flash'] = genai.GenerativeModel('gemini-2.5-flash')
         logger.info("Gemini client initialized successfully with gemini-2.5-flash.")
     else:
         logger.warning("GEMINI_API_KEY not set. Gemini features will be disabled.")
 
     if Config.GROQ_API_KEY:
-        groq_client = Groq(api_key=Config.GROQ_API_KEY)
+        groq_client = AsyncGroq(api_key=Config.GROQ_API_KEY, http_client=_async_http)
         logger.info("Groq client initialized successfully.")
     else:
         logger.warning("GROQ_API_KEY not set. Groq features will be disabled.")
 except Exception as e:
-    logger.error(f"Error initializing AI clients: {e}")
+    logger.error("Error initializing AI clients: %s", e)
+
+language_id_model = None
+if Config.LANGUAGE_ID_MODEL:
+    if fasttext is None:
+        logger.warning("LANGUAGE_ID_MODEL is set but fasttext is not installed. Local language detection will be disabled.")
+    else:
+        try:
+            language_id_model = fasttext.load_model(Config.LANGUAGE_ID_MODEL)
+            logger.info("Local language ID model loaded successfully.")
+        except Exception as e:
+            logger.error("Failed to load language ID model: %s", e)
+
+# CLD3 ships its model inside the package, so it covers deployments without a
+# fastText model file.
+cld3_identifier = None
+if not language_id_model and gcld3 is not None:
+    cld3_identifier = gcld3.NNetLanguageIdentifier(min_num_bytes=0, max_num_bytes=1000)
+    logger.info("Using CLD3 for local language detection.")
 
 # --- Database Functions ---
-def init_db():
-    logger.info("Initializing database...")
-    conn = sqlite3.connect('health_bot.db')
-    cursor = conn.cursor()
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS conversations (
-            id INTEGER PRIMARY KEY AUTOINCREMENT, user_phone TEXT NOT NULL,
-            message TEXT NOT NULL, response TEXT NOT NULL,
-            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP, language TEXT DEFAULT 'en',
-            ai_service TEXT DEFAULT 'gemini'
-        )
-    ''')
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS user_profiles (
-            phone TEXT PRIMARY KEY, name TEXT, preferred_language TEXT DEFAULT 'en',
-            health_conditions TEXT, created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-            last_active DATETIME DEFAULT CURRENT_TIMESTAMP
-        )
-    ''')
-    conn.commit()
-    conn.close()
-    logger.info("Database initialized successfully.")
-
-def save_conversation(user_phone, message, response, language='en'):
-    logger.info(f"Saving conversation for user {user_phone}...")
+# One persistent write connection shared by all background threads; writes are
+# serialized through the lock so threads queue behind a single writer.
+_db_write_lock = threading.Lock()
+_db_conn = connect_db()
+# The flusher, outbox loop and caches below write through _db_conn as soon as
+# the module loads, so the tables must exist before any entry point runs.
+init_db()
+
+# Conversations are not written inline: save_conversation enqueues the row and
+# a single flusher thread commits everything that arrived in the last
+# WRITE_FLUSH_INTERVAL seconds in one transaction, amortizing the WAL fsync.
+# Delivered outbox rows are deleted in that same transaction, so a reply is
+# either still pending or recorded, never lost in between. If the batch fails,
+# the deletes are retried on their own: a reply that was sent must never be
+# re-sent just because its conversation row could not be stored.
+WRITE_BATCH_SIZE = 500
+WRITE_FLUSH_INTERVAL = 0.2
+_write_queue = queue.Queue()
+
+def _write_conversations(rows):
+    """Persist a batch of (user_phone, message, response, language, timestamp, send_id) rows."""
+    with _db_write_lock:
+        _db_conn.execute("BEGIN IMMEDIATE")
+        try:
+            _db_conn.executemany("INSERT INTO conversations (user_phone, message, response, language, timestamp) VALUES (?, ?, ?, ?, ?)",
+                                 [row[:5] for row in rows])
+            _db_conn.executemany("""
+                INSERT INTO user_profiles (phone, created_at, last_active) VALUES (?, ?, ?)
+                ON CONFLICT(phone) DO UPDATE SET last_active = excluded.last_active
+            """, [(row[0], row[4], row[4]) for row in rows])
+            _db_conn.executemany("DELETE FROM pending_sends WHERE id = ?",
+                                 [(row[5],) for row in rows if row[5] is not None])
+            _db_conn.execute("COMMIT")
+        except Exception:
+            _db_conn.execute("ROLLBACK")
+            raise
+
+def _forget_delivered_sends(send_ids):
+    """Drop delivered outbox rows when the batch that should have dropped them failed."""
+    if not send_ids:
+        return
     try:
-        conn = sqlite3.connect('health_bot.db')
-        cursor = conn.cursor()
-        cursor.execute("INSERT INTO conversations (user_phone, message, response, language) VALUES (?, ?, ?, ?)",
-                       (user_phone, message, response, language))
-        cursor.execute("INSERT OR IGNORE INTO user_profiles (phone) VALUES (?)", (user_phone,))
-        cursor.execute("UPDATE user_profiles SET last_active = ? WHERE phone = ?", (datetime.now(), user_phone))
-        conn.commit()
-        conn.close()
-        logger.info(f"Conversation for {user_phone} saved successfully.")
+        with _db_write_lock:
+            _db_conn.executemany("DELETE FROM pending_sends WHERE id = ?", [(send_id,) for send_id in send_ids])
     except Exception as e:
-        logger.error(f"Error saving conversation: {e}")
+        logger.error("Error clearing %s delivered outbox row(s): %s", len(send_ids), e)
+
+def _flush_loop():
+    while True:
+        rows = [_write_queue.get()]
+        deadline = time.monotonic() + WRITE_FLUSH_INTERVAL
+        while len(rows) < WRITE_BATCH_SIZE:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                rows.append(_write_queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        try:
+            _write_conversations(rows)
+            logger.info("Flushed %s conversation(s) to the database.", len(rows))
+        except Exception as e:
+            logger.error("Error saving %s conversation(s): %s", len(rows), e)
+            _forget_delivered_sends([row[5] for row in rows if row[5] is not None])
+        finally:
+            for _ in rows:
+                _write_queue.task_done()
+
+Thread(target=_flush_loop, name='db-flush', daemon=True).start()
+# Let the flusher drain whatever is still queued before the interpreter exits.
+atexit.register(_write_queue.join)
+
+def save_conversation(user_phone, message, response, language='en', send_id=None):
+    logger.info("Queueing conversation for user %s...", user_phone)
+    _write_queue.put((user_phone, message, response, language, int(time.time()), send_id))
 
 def get_recent_conversations(user_phone, limit=30):
-    """Retrieve recent conversations for a user, up to the specified limit."""
-    logger.info(f"Retrieving up to {limit} recent conversations for user {user_phone}...")
+    """Retrieve a user's most recent conversations, up to limit, oldest first."""
+    logger.info("Retrieving up to %s recent conversations for user %s...", limit, user_phone)
     try:
-        conn = sqlite3.connect('health_bot.db')
-        cursor = conn.cursor()
-        cursor.execute("""
+        rows = get_read_conn().execute("""
             SELECT message, response, timestamp, language
             FROM conversations
             WHERE user_phone = ?
             ORDER BY timestamp DESC
             LIMIT ?
-        """, (user_phone, limit))
-        rows = cursor.fetchall()
-        conn.close()
+        """, (user_phone, limit)).fetchall()
         
-        # Convert to list of dictionaries
+        # Convert to list of dictionaries, flipping the index order once here
+        # so callers get chat order
         conversations = [
             {
                 "message": row[0],
@@ -130,44 +231,226 @@ def get_recent_conversations(user_phone, limit=30):
                 "timestamp": row[2],
                 "language": row[3]
             }
-            for row in rows
+            for row in reversed(rows)
         ]
         
-        logger.info(f"Retrieved {len(conversations)} conversations for user {user_phone}.")
+        logger.info("Retrieved %s conversations for user %s.", len(conversations), user_phone)
         return conversations
     except Exception as e:
-        logger.error(f"Error retrieving conversations: {e}")
+        logger.error("Error retrieving conversations: %s", e)
         return []
 
+# --- Async I/O ---
+# One long-lived event loop runs in a daemon thread. Background workers hand it
+# coroutines so independent network calls overlap, and the shared AsyncClient
+# keeps its connection pool alive across messages.
+_loop = asyncio.new_event_loop()
+Thread(target=_loop.run_forever, name='aio-loop', daemon=True).start()
+
+# Upper bound on how long a worker thread waits for the loop; a hung provider
+# call is cancelled instead of pinning a worker forever.
+ASYNC_CALL_TIMEOUT = 60
+
+def run_async(coro, timeout=ASYNC_CALL_TIMEOUT):
+    """Run a coroutine on the shared event loop and block until it completes."""
+    future = asyncio.run_coroutine_threadsafe(coro, _loop)
+    try:
+        return future.result(timeout)
+    except FutureTimeoutError:
+        future.cancel()
+        raise
+
+atexit.register(lambda: run_async(_async_http.aclose()))
+
+# Per-call budgets for upstream AI providers, in seconds. A call that overruns
+# is abandoned and handled like any other provider error.
+AI_CALL_TIMEOUTS = {'gemini': 20, 'groq': 15, 'perplexity': 15}
+
+class CircuitOpenError(Exception):
+    pass
+
+class CircuitBreaker:
+    """Stops calling a provider for reset_timeout seconds after fail_max
+    consecutive failures, so an outage costs one fast error per call instead
+    of a full timeout. Only used from the event loop thread."""
+
+    def __init__(self, name, fail_max=5, reset_timeout=30):
+        self.name = name
+        self.fail_max = fail_max
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at = None
+        self.trial_running = False
+
+    def allow(self):
+        # After reset_timeout exactly one trial call goes through; everything
+        # else is still refused until its result closes the breaker or opens
+        # it again.
+        if self._opened_at is None:
+            return True
+        if self.trial_running or time.monotonic() - self._opened_at < self.reset_timeout:
+            return False
+        self.trial_running = True
+        return True
+
+    def record_success(self):
+        self._failures = 0
+        self._opened_at = None
+
+    def record_failure(self):
+        self._failures += 1
+        if self._failures >= self.fail_max:
+            if self._opened_at is None:
+                logger.warning("Circuit for %s opened after %s consecutive failures.", self.name, self._failures)
+            self._opened_at = time.monotonic()
+
+_breakers = {name: CircuitBreaker(name) for name in AI_CALL_TIMEOUTS}
+
+async def call_provider(name, coro):
+    """Await coro under the provider's timeout and circuit breaker."""
+    breaker = _breakers[name]
+    if not breaker.allow():
+        coro.close()
+        raise CircuitOpenError(f"{name} circuit is open")
+    trial = breaker.trial_running
+    try:
+        result = await asyncio.wait_for(coro, AI_CALL_TIMEOUTS[name])
+    except asyncio.TimeoutError:
+        breaker.record_failure()
+        raise TimeoutError(f"{name} call timed out after {AI_CALL_TIMEOUTS[name]}s") from None
+    except Exception:
+        breaker.record_failure()
+        raise
+    finally:
+        # Also reached when the call is cancelled, which records neither outcome.
+        if trial:
+            breaker.trial_running = False
+    breaker.record_success()
+    return result
+
 # --- Language and AI Functions ---
-def translate_with_gemini(text, target_lang):
+# LRU of successful translations keyed by (text, target_lang). Bot traffic is
+# full of repeated short messages ("hi", "thanks", "fever"), so these skip the
+# Gemini round-trip entirely. Only touched from the event loop thread. Misses
+# fall through to the translation_cache table, which every worker shares and
+# which survives restarts.
+TRANSLATION_CACHE_SIZE = 4096
+TRANSLATION_CACHE_MAX_TEXT = 512
+# Stored rows hold users' messages, so they expire and are pruned like the
+# response cache; a week still covers the repeated greetings and symptoms.
+TRANSLATION_CACHE_TTL = 7 * 86400
+_translation_cache = OrderedDict()
+_translations_in_flight = {}
+
+def translation_cache_key(text, target_lang):
+    return hashlib.blake2b(f"{target_lang}\0{text}".encode('utf-8'), digest_size=16).hexdigest()
+
+def get_stored_translation(text, target_lang):
+    try:
+        row = get_read_conn().execute(
+            "SELECT detected_language, translated_text FROM translation_cache WHERE key = ? AND created_at >= ?",
+            (translation_cache_key(text, target_lang), time.time() - TRANSLATION_CACHE_TTL)).fetchone()
+    except Exception as e:
+        logger.error("Error reading translation cache: %s", e)
+        return None
+    return {"detected_language": row[0], "translated_text": row[1]} if row else None
+
+def store_translation(text, target_lang, result):
+    try:
+        with _db_write_lock:
+            _db_conn.execute(
+                "INSERT OR REPLACE INTO translation_cache (key, detected_language, translated_text, created_at) VALUES (?, ?, ?, ?)",
+                (translation_cache_key(text, target_lang), result['detected_language'], result['translated_text'], time.time()))
+    except Exception as e:
+        logger.error("Error writing translation cache: %s", e)
+
+def remember_translation(text, target_lang, result):
+    _translation_cache[(text, target_lang)] = result
+    if len(_translation_cache) > TRANSLATION_CACHE_SIZE:
+        _translation_cache.popitem(last=False)
+
+LANGUAGE_ID_MIN_CONFIDENCE = 0.9
+
+# Ask Gemini for JSON directly instead of stripping markdown fences afterwards.
+JSON_GENERATION_CONFIG = {'response_mime_type': 'application/json'}
+
+def is_english(lang):
+    """Gemini reports languages as codes or names, so accept either for English.
+
+    Regional variants ("en-US", "en_GB") count as English, and so does "und"
+    (undetermined), where the default English reply is the safest choice.
+    """
+    if not lang:
+        return True
+    return re.split(r'[-_ (]', lang.strip().lower(), 1)[0] in ('en', 'eng', 'english', 'und')
+
+def detect_language(text):
+    """Identify the language of text locally; returns None when unsure or no model is loaded."""
+    if cld3_identifier:
+        result = cld3_identifier.FindLanguage(text=text)
+        return result.language if result.is_reliable else None
+    if not language_id_model:
+        return None
+    labels, probabilities = language_id_model.predict(text.replace('\n', ' '), k=1)
+    if probabilities[0] < LANGUAGE_ID_MIN_CONFIDENCE:
+        return None
+    return labels[0].removeprefix('__label__')
+
+async def translate_to_english(text):
+    """Translate an inbound message to English, skipping Gemini for messages already in English."""
+    if detect_language(text) == 'en':
+        logger.info("Local language ID detected English; skipping inbound translation.")
+        return {"detected_language": "en", "translated_text": text}
+    return await translate_with_gemini(text, "English")
+
+async def translate_with_gemini(text, target_lang):
     """Detects source language and translates text using Gemini, returning a dictionary."""
-    logger.info(f"Starting translation process for target language '{target_lang}'...")
+    key = (text, target_lang)
+    # The fixed replies are long but constant, so they are always worth keeping.
+    cacheable = len(text) <= TRANSLATION_CACHE_MAX_TEXT or text in CANNED_RESPONSES
+    if cacheable and key in _translation_cache:
+        _translation_cache.move_to_end(key)
+        logger.info("Translation cache hit for target language '%s'.", target_lang)
+        return _translation_cache[key]
+    # Identical requests that arrive while one is in flight (a burst of "hi",
+    # or the emergency text for a new language) share that single Gemini call.
+    task = _translations_in_flight.get(key)
+    if task is None:
+        task = asyncio.ensure_future(_gemini_translate(text, target_lang, cacheable))
+        _translations_in_flight[key] = task
+        task.add_done_callback(lambda _: _translations_in_flight.pop(key, None))
+    else:
+        logger.info("Joining in-flight translation for target language '%s'.", target_lang)
+    return await asyncio.shield(task)
+
+async def _gemini_translate(text, target_lang, cacheable):
+    if cacheable:
+        stored = await asyncio.to_thread(get_stored_translation, text, target_lang)
+        if stored:
+            logger.info("Stored translation hit for target language '%s'.", target_lang)
+            remember_translation(text, target_lang, stored)
+            return stored
+    logger.info("Starting translation process for target language '%s'...", target_lang)
     try:
         prompt = f"""Analyze the following text. First, identify its source language. Second, translate it to {target_lang}.
         Provide the output ONLY as a valid JSON object with two keys: "detected_language" and "translated_text".
         Text to analyze: "{text}"
         """
-        response = gemini_model.generate_content(prompt)
-        
-        # Clean the response to ensure it's valid JSON
-        cleaned_response = response.text.strip().replace('```json', '').replace('```', '')
-        result = json.loads(cleaned_response)
+        response = await call_provider('gemini', gemini_model.generate_content_async(prompt, generation_config=JSON_GENERATION_CONFIG))
+        result = orjson.loads(response.text)
         
-        logger.info(f"Gemini translation successful. Detected language: {result.get('detected_language')}")
+        logger.info("Gemini translation successful. Detected language: %s", result.get('detected_language'))
+        if cacheable:
+            remember_translation(text, target_lang, result)
+            # Persist in the background rather than wait on the writer lock
+            _loop.run_in_executor(None, store_translation, text, target_lang, result)
         return result
     except Exception as e:
-        logger.error(f"Gemini translation/detection failed: {e}. Defaulting to English.")
+        logger.error("Gemini translation/detection failed: %s. Defaulting to English.", e)
         return {"detected_language": "en", "translated_text": text}
 
-def get_gemini_response(prompt, model_name='gemini-2.5-flash', conversation_history=None):
-    if not gemini_model: return "AI service is not configured."
-    logger.info(f"Getting response from Gemini model: {model_name}...")
-    try:
-        model = genai.GenerativeModel(model_name)
-        
-        # Build context with conversation history if available
-        context = """
+# System context for every Aura reply; built once rather than per call.
+AURA_CONTEXT = """
         You are "Aura," a friendly and knowledgeable AI health assistant. Your role is to provide helpful, accurate health information in a warm, conversational way - like a caring friend who happens to know a lot about health topics.
 
         Key guidelines for your responses:
@@ -192,72 +475,129 @@ def get_gemini_response(prompt, model_name='gemini-2.5-flash', conversation_hist
 
         You're continuing a conversation with a user. Use the conversation history to provide more personalized responses, but keep your response as a single, cohesive message that's short and to the point.
         """
-        
-        # Prepare conversation history for the model
-        history_messages = []
-        if conversation_history:
-            # Add recent conversation history (limit to last 30 exchanges)
-            for i, conv in enumerate(reversed(conversation_history[:30])):
-                history_messages.append({"role": "user", "parts": [conv['message']]})
-                history_messages.append({"role": "model", "parts": [conv['response']]})
-        
+
+def get_gemini_model(model_name):
+    """Return the GenerativeModel for model_name, building it only on first use."""
+    model = _gemini_models.get(model_name)
+    if model is None:
+        model = _gemini_models[model_name] = genai.GenerativeModel(model_name)
+    return model
+
+# Appended to AURA_CONTEXT when translation and answering share one call.
+FUSED_RESPONSE_FORMAT = """
+        The user may write in any language. Reply ONLY with a JSON object with three keys:
+        "detected_language": the language of the user's message,
+        "english_question": the user's message translated to English,
+        "answer": your response to the user, written in the user's language.
+        """
+
+def build_chat_history(conversation_history):
+    """Turn stored conversations (oldest first) into Gemini chat history."""
+    history_messages = []
+    if conversation_history:
+        for conv in conversation_history:
+            history_messages.append({"role": "user", "parts": [conv['message']]})
+            history_messages.append({"role": "model", "parts": [conv['response']]})
+    return history_messages
+
+async def get_gemini_response(prompt, model_name='gemini-2.5-flash', conversation_history=None, reply_language='en'):
+    if not gemini_model: return "AI service is not configured."
+    logger.info("Getting response from Gemini model: %s...", model_name)
+    try:
+        model = get_gemini_model(model_name)
+        history_messages = build_chat_history(conversation_history)
+
+        # Answer in the user's language directly so the reply needs no second
+        # translation round-trip
+        language_note = ""
+        if not is_english(reply_language):
+            language_note = f"\n        Write your entire response in the user's language ({reply_language}).\n"
+
         # Create the full prompt with context
-        full_prompt = f"{context}\n\nHere is the user's question: {prompt}\n\nYour response:"
+        full_prompt = f"{AURA_CONTEXT}{language_note}\n\nHere is the user's question: {prompt}\n\nYour response:"
         
         # Generate response with conversation history
         chat = model.start_chat(history=history_messages)
-        response = chat.send_message(full_prompt)
+        response = await call_provider('gemini', chat.send_message_async(full_prompt))
         
-        logger.info(f"Successfully received response from {model_name}.")
+        logger.info("Successfully received response from %s.", model_name)
         return response.text
     except Exception as e:
-        logger.error(f"Gemini API error with model {model_name}: {e}")
+        logger.error("Gemini API error with model %s: %s", model_name, e)
+        return None
+
+async def get_fused_response(user_message, conversation_history=None, model_name='gemini-2.5-flash'):
+    """Translate a message to English and answer it in the user's language in one Gemini call.
+
+    Returns a dict with "detected_language", "english_question" and "answer",
+    or None so the caller can fall back to separate translate and answer calls.
+    """
+    if not gemini_model: return None
+    logger.info("Translating and answering in one call with Gemini model: %s...", model_name)
+    try:
+        chat = get_gemini_model(model_name).start_chat(history=build_chat_history(conversation_history))
+        full_prompt = f"{AURA_CONTEXT}{FUSED_RESPONSE_FORMAT}\n\nHere is the user's message: {user_message}"
+        response = await call_provider('gemini', chat.send_message_async(full_prompt, generation_config=JSON_GENERATION_CONFIG))
+        result = orjson.loads(response.text)
+        if not all(result.get(key) for key in ('detected_language', 'english_question', 'answer')):
+            raise ValueError("incomplete JSON reply")
+        logger.info("Fused Gemini call successful. Detected language: %s", result['detected_language'])
+        return result
+    except Exception as e:
+        logger.error("Fused Gemini call failed: %s", e)
         return None
 
-def get_perplexity_search(query):
+async def _perplexity_request(query):
+    """POST one search. Error statuses raise here, inside call_provider, so the
+    circuit breaker counts them as failures rather than successes."""
+    response = await _async_http.post(
+        'https://api.perplexity.ai/chat/completions',
+        headers={
+            'Authorization': f'Bearer {Config.PERPLEXITY_API_KEY}',
+            'Content-Type': 'application/json'
+        },
+        json={
+            'model': 'sonar-pro',
+            'messages': [
+                {
+                    'role': 'system',
+                    'content': "You are Aura, a compassionate AI Health & Wellness Assistant research aide. Find recent, evidence-based medical information for the user's health query. Focus on key symptoms, treatments, and when to seek professional care. Explain medical terms simply. Prioritize user safety and include disclaimers about professional medical consultation. Keep your response concise and focused - under 1600 characters."
+                },
+                {
+                    'role': 'user',
+                    'content': query
+                }
+            ]
+        }
+    )
+    if response.status_code != 200:
+        raise RuntimeError(f"Perplexity API returned status {response.status_code}: {response.text}")
+    return response.json()['choices'][0]['message']['content']
+
+async def get_perplexity_search(query):
     if not Config.PERPLEXITY_API_KEY:
         logger.warning("PERPLEXITY_API_KEY not set. Perplexity search will be disabled.")
         return None
-    logger.info(f"Searching Perplexity (sonar-pro) for: '{query}'")
+    logger.info("Searching Perplexity (sonar-pro) for: '%s'", query)
     try:
-        response = requests.post(
-            'https://api.perplexity.ai/chat/completions',
-            headers={
-                'Authorization': f'Bearer {Config.PERPLEXITY_API_KEY}',
-                'Content-Type': 'application/json'
-            },
-            json={
-                'model': 'sonar-pro',
-                'messages': [
-                    {
-                        'role': 'system',
-                        'content': "You are Aura, a compassionate AI Health & Wellness Assistant research aide. Find recent, evidence-based medical information for the user's health query. Focus on key symptoms, treatments, and when to seek professional care. Explain medical terms simply. Prioritize user safety and include disclaimers about professional medical consultation. Keep your response concise and focused - under 1600 characters."
-                    },
-                    {
-                        'role': 'user',
-                        'content': query
-                    }
-                ]
-            }
-        )
-        if response.status_code == 200:
-            logger.info("Perplexity search successful.")
-            return response.json()['choices'][0]['message']['content']
-        else:
-            logger.error(f"Perplexity API returned status {response.status_code}: {response.text}")
+        result = await call_provider('perplexity', _perplexity_request(query))
+        logger.info("Perplexity search successful.")
+        return result
     except Exception as e:
-        logger.error(f"Perplexity search error: {e}")
+        logger.error("Perplexity search error: %s", e)
     return None
 
-def get_groq_summary(text):
+GROQ_SUMMARY_MODEL = "openai/gpt-oss-120b"
+
+async def get_groq_summary(text):
     if not groq_client: return None
-    model_to_use = "openai/gpt-oss-120b"
-    logger.info(f"Summarizing text with Groq model {model_to_use}...")
+    model_to_use = GROQ_SUMMARY_MODEL
+    logger.info("Summarizing text with Groq model %s...", model_to_use)
     try:
-        completion = groq_client.chat.completions.create(
+        completion = await call_provider('groq', groq_client.chat.completions.create(
             model=model_to_use,
             messages=[
-                {"role": "system", "content": "You are Aura, a compassionate AI Health & Wellness Assistant. Refine the following health information into a clear, concise response for a patient using a conversational, gentle, and reassuring tone. Include: 1) Key medical facts explained simply, 2) Brief self-care advice, 3) When to seek professional medical help. Keep it short and strictly under 1600 characters. Use simple language. Always start with empathy and end with a safety disclaimer when providing significant health advice."},
+                {"role": "system", "content": "You are Aura, a compassionate AI Health & Wellness Assistant. Refine the following health information into a clear, concise response for a patient using a conversational, gentle, and reassuring tone. Include: 1) Key medical facts explained simply, 2) Brief self-care advice, 3) When to seek professional medical help. Keep it short and strictly under 1600 characters. Use simple language. Always start with empathy and end with a safety disclaimer when providing significant health advice. Reply in the same language as the text you are given."},
                 {"role": "user", "content": text}
             ],
             temperature=0.7,
@@ -265,30 +605,146 @@ def get_groq_summary(text):
             top_p=1,
             stream=False,  # Changed to False for non-streaming
             stop=None
-        )
+        ))
         logger.info("Groq summary successful.")
         return completion.choices[0].message.content
     except Exception as e:
-        logger.error(f"Groq API error: {e}")
+        logger.error("Groq API error: %s", e)
+    return None
+
+# --- Response Cache ---
+# Users ask the same health questions over and over. Gemini/Groq answers are
+# cached by a hash of the normalized English query and the reply language, in
+# memory and in the response_cache table so hits survive restarts. Only
+# first-turn answers (no history) are cached: an answer shaped by a user's
+# history is specific to that conversation, would almost never be asked for
+# again, and must not leak into another user's reply.
+LLM_CACHE_TTL = 86400
+LLM_CACHE_SIZE = 10000
+_llm_cache = OrderedDict()
+_llm_cache_lock = threading.Lock()
+
+def response_cache_key(message_in_english, user_lang='en'):
+    normalized = ' '.join(message_in_english.lower().split())
+    if not is_english(user_lang):
+        normalized = f"{user_lang.lower()}:{normalized}"
+    return hashlib.sha1(normalized.encode('utf-8')).hexdigest()
+
+def get_cached_response(key):
+    now = time.time()
+    with _llm_cache_lock:
+        entry = _llm_cache.get(key)
+        if entry and now - entry[1] < LLM_CACHE_TTL:
+            _llm_cache.move_to_end(key)
+            return entry[0]
+    try:
+        row = get_read_conn().execute("SELECT response, created_at FROM response_cache WHERE key = ?", (key,)).fetchone()
+    except Exception as e:
+        logger.error("Error reading response cache: %s", e)
+        return None
+    if row and now - row[1] < LLM_CACHE_TTL:
+        with _llm_cache_lock:
+            _llm_cache[key] = (row[0], row[1])
+        return row[0]
     return None
 
+def cache_response(key, response):
+    now = time.time()
+    with _llm_cache_lock:
+        _llm_cache[key] = (response, now)
+        _llm_cache.move_to_end(key)
+        if len(_llm_cache) > LLM_CACHE_SIZE:
+            _llm_cache.popitem(last=False)
+    try:
+        with _db_write_lock:
+            _db_conn.execute("INSERT OR REPLACE INTO response_cache (key, response, created_at) VALUES (?, ?, ?)",
+                             (key, response, now))
+    except Exception as e:
+        logger.error("Error writing response cache: %s", e)
+
+# Reads already ignore expired rows; this deletes them so neither cache table
+# keeps copies of users' messages and answers forever. Run from the outbox loop.
+CACHE_PRUNE_INTERVAL = 3600
+
+def prune_expired_caches():
+    now = time.time()
+    with _db_write_lock:
+        deleted = _db_conn.execute("DELETE FROM response_cache WHERE created_at < ?", (now - LLM_CACHE_TTL,)).rowcount
+        deleted += _db_conn.execute("DELETE FROM translation_cache WHERE created_at < ?", (now - TRANSLATION_CACHE_TTL,)).rowcount
+    if deleted:
+        logger.info("Pruned %s expired cache row(s).", deleted)
+
+def warm_up_clients():
+    """Send tiny requests in the background so TLS and auth setup is done
+    before the first real user message reaches this worker."""
+    def _warm_up():
+        # Perplexity and Twilio need no real request: any response, even an
+        # error status, leaves a live TLS connection in the shared pool.
+        if Config.PERPLEXITY_API_KEY:
+            try:
+                run_async(_async_http.head('https://api.perplexity.ai/'))
+                logger.info("Perplexity connection warmed up.")
+            except Exception as e:
+                logger.warning("Perplexity warm-up failed: %s", e)
+        if twilio_messages_url:
+            try:
+                _http.head('https://api.twilio.com/')
+                logger.info("Twilio connection warmed up.")
+            except Exception as e:
+                logger.warning("Twilio warm-up failed: %s", e)
+        if groq_client:
+            try:
+                run_async(groq_client.chat.completions.create(
+                    model=GROQ_SUMMARY_MODEL,
+                    messages=[{"role": "user", "content": "ok"}],
+                    max_tokens=1
+                ))
+                logger.info("Groq client warmed up.")
+            except Exception as e:
+                logger.warning("Groq warm-up failed: %s", e)
+        if gemini_model:
+            try:
+                run_async(gemini_model.generate_content_async('ping', generation_config={'max_output_tokens': 1}))
+                logger.info("Gemini client warmed up.")
+            except Exception as e:
+                logger.warning("Gemini warm-up failed: %s", e)
+            # Slowest step, so it goes last. Twenty sequential translations can
+            # take minutes on a cold start; each call already has its own
+            # Gemini timeout, so the batch as a whole gets no extra deadline.
+            try:
+                run_async(prewarm_canned_translations(), timeout=None)
+            except Exception as e:
+                logger.warning("Pre-translating fixed replies failed: %r", e)
+    Thread(target=_warm_up, name='warm-up', daemon=True).start()
+
 # --- Core Bot Logic ---
-def determine_response_strategy(message):
-    message_lower = message.lower()
-    strategy = 'reason_only' # Default strategy
-    if any(k in message_lower for k in ['emergency', 'chest pain', 'heart attack', 'stroke']):
-        strategy = 'emergency'
-    elif any(k in message_lower for k in ['latest', 'recent', 'new treatment']):
-        strategy = 'search_and_reason'
-    logger.info(f"Determined response strategy: '{strategy}'")
-    return strategy
+# Gemini is already prompted for short, patient-friendly answers; the Groq
+# refinement pass only pays off for long or rambling replies.
+SUMMARIZE_MIN_CHARS = 800
+SUMMARIZE_MIN_SENTENCES = 8
+SENTENCE_END_RE = re.compile(r'[.!?](?:\s|$)')
+_summary_stats = {'summarized': 0, 'skipped': 0}
+_summary_stats_lock = threading.Lock()
 
-def process_health_query(message_in_english, user_phone=None, conversation_history=None):
-    strategy = determine_response_strategy(message_in_english)
-    
-    response = ""
-    if strategy == 'emergency':
-        response = """I'm really concerned about what you're experiencing, and I want to make sure you get the immediate help you need.
+async def maybe_summarize(text):
+    """Refine long replies with Groq; short ones are returned unchanged."""
+    if not text:
+        return text
+    needed = len(text) > SUMMARIZE_MIN_CHARS or len(SENTENCE_END_RE.findall(text)) > SUMMARIZE_MIN_SENTENCES
+    with _summary_stats_lock:
+        _summary_stats['summarized' if needed else 'skipped'] += 1
+        skipped = _summary_stats['skipped']
+        total = skipped + _summary_stats['summarized']
+    logger.info("Groq summary %s for %s-char reply (skip rate %s/%s).", 'needed' if needed else 'skipped', len(text), skipped, total)
+    if not needed:
+        return text
+    return await get_groq_summary(text) or text
+
+# Sent when every provider call for a query failed, so the user is never left
+# without a reply.
+FALLBACK_RESPONSE = "I'm sorry, I'm having trouble answering right now. Please try again in a few minutes. If this is urgent, please contact a doctor or your local emergency number."
+
+EMERGENCY_RESPONSE = """I'm really concerned about what you're experiencing, and I want to make sure you get the immediate help you need.
 
 🚨 Based on what you've just described, these symptoms can be very serious. Please do not wait. You need to seek immediate medical attention.
 
@@ -301,79 +757,467 @@ Please take these steps right now:
 While I cannot provide emergency medical care, I want you to know that professional medical help is essential for these situations, and you're doing the right thing by seeking it immediately.
 
 Please go ahead and make that call now. I'll be here if you need any other support after this immediate situation is addressed."""
+
+# Translations of the fixed replies (EMERGENCY_RESPONSE, FALLBACK_RESPONSE),
+# keyed by (text, lower-cased language code or name). The texts are constant,
+# so each only needs to go through Gemini once per language.
+CANNED_RESPONSES = (EMERGENCY_RESPONSE, FALLBACK_RESPONSE)
+_canned_translations = {}
+
+# Languages whose fixed replies are translated when a worker starts, so the
+# first emergency in them is not held up by a Gemini call, and the fallback
+# can still be sent in the user's language while Gemini is down. Gemini
+# reports a language either way, so both the code and the name are filled in.
+PREWARM_LANGUAGES = {
+    'hi': 'Hindi', 'bn': 'Bengali', 'ta': 'Tamil', 'te': 'Telugu',
+    'mr': 'Marathi', 'gu': 'Gujarati', 'kn': 'Kannada', 'ml': 'Malayalam',
+    'pa': 'Punjabi', 'ur': 'Urdu',
+}
+
+async def get_canned_response(text, lang):
+    """Return one of CANNED_RESPONSES in the given language, translating it at most once."""
+    if is_english(lang):
+        return text
+    key = (text, lang.strip().lower())
+    cached = _canned_translations.get(key)
+    if cached is None:
+        cached = (await translate_with_gemini(text, lang))['translated_text']
+        # Only keep real translations; a failed call falls back to the English text.
+        if cached != text:
+            _canned_translations[key] = cached
+    return cached
+
+async def prewarm_canned_translations():
+    """Fill _canned_translations one language at a time. After the first start
+    these come from the translation_cache table; a Gemini failure (e.g. quota
+    during a deploy) stops the run rather than tripping the circuit breaker
+    that live users depend on."""
+    done = 0
+    # The fallback first: it is the reply sent when Gemini is down, so it is
+    # the one that cannot be translated on demand.
+    for text in (FALLBACK_RESPONSE, EMERGENCY_RESPONSE):
+        for code, name in PREWARM_LANGUAGES.items():
+            translated = await get_canned_response(text, name)
+            if translated == text:
+                logger.warning("Stopped pre-translating fixed replies after %s; Gemini translation failed.", done)
+                return
+            _canned_translations[(text, code)] = translated
+            done += 1
+    logger.info("Pre-translated %s fixed replies into %s language(s).", len(CANNED_RESPONSES), len(PREWARM_LANGUAGES))
+
+# Keyword triage compiled once. These are plain substring matches, same as the
+# original `in` checks: no word boundaries, so "heatstroke" and "sunstroke"
+# still count as emergencies.
+EMERGENCY_KEYWORDS_RE = re.compile(r'emergency|chest pain|heart attack|stroke', re.IGNORECASE)
+SEARCH_KEYWORDS_RE = re.compile(r'latest|recent|new treatment', re.IGNORECASE)
+
+# How long a search answer may take before the plain Gemini answer is sent
+# instead. Gemini usually finishes first; this bounds how long it waits on
+# Perplexity after that.
+SEARCH_DEADLINE_SECONDS = 6
+
+def determine_response_strategy(message):
+    strategy = 'reason_only' # Default strategy
+    if EMERGENCY_KEYWORDS_RE.search(message):
+        strategy = 'emergency'
+    elif SEARCH_KEYWORDS_RE.search(message):
+        strategy = 'search_and_reason'
+    logger.info("Determined response strategy: '%s'", strategy)
+    return strategy
+
+async def process_health_query(message_in_english, user_phone=None, conversation_history=None, search_task=None, user_lang='en', draft_response=None):
+    """Answer an English query, replying in user_lang (emergencies excepted).
+
+    draft_response is a plain Gemini answer that was already produced (by the
+    fused translate-and-answer call) and is used instead of asking again.
+    search_task is a Perplexity search prefetched by prepare_query; when given,
+    its result is used even if it is None, rather than searching a second time.
+    """
+    strategy = determine_response_strategy(message_in_english)
+    if search_task is not None and strategy != 'search_and_reason':
+        # Prefetched on the raw message, but the translation triaged differently.
+        search_task.cancel()
+
+    # Search answers must stay fresh and emergency replies are already constant,
+    # so only first-turn reason_only answers go through the cache.
+    cache_key = None
+    if strategy == 'reason_only' and not conversation_history:
+        cache_key = response_cache_key(message_in_english, user_lang)
+        cached = await asyncio.to_thread(get_cached_response, cache_key)
+        if cached:
+            logger.info("Response cache hit; skipping Gemini/Groq.")
+            return cached
+
+    response = ""
+    if strategy == 'emergency':
+        response = EMERGENCY_RESPONSE
     elif strategy == 'search_and_reason':
-        search_result = get_perplexity_search(message_in_english)
+        # Run the search (unless prepare_query already started it) and a plain
+        # Gemini answer side by side. The plain answer is used if the search
+        # fails or misses its deadline, and then it is already there instead
+        # of costing another round-trip.
+        baseline_response = draft_response
+        search_result = None
+        deadline = asyncio.get_running_loop().time() + SEARCH_DEADLINE_SECONDS
+        if search_task is None:
+            search_task = asyncio.ensure_future(get_perplexity_search(message_in_english))
+        if baseline_response is None:
+            baseline_response = await get_gemini_response(message_in_english, conversation_history=conversation_history, reply_language=user_lang)
+        try:
+            if baseline_response:
+                remaining = max(0, deadline - asyncio.get_running_loop().time())
+                search_result = await asyncio.wait_for(search_task, remaining)
+            else:
+                search_result = await search_task
+        except asyncio.TimeoutError:
+            # wait_for cancelled the search, and call_provider records nothing
+            # for a cancelled call; count it here so a hung Perplexity still
+            # opens the breaker instead of costing every search the deadline.
+            _breakers['perplexity'].record_failure()
+            logger.warning("Perplexity search missed its %ss deadline.", SEARCH_DEADLINE_SECONDS)
         if search_result:
             gemini_prompt = f"Based on this recent health information: {search_result}\n\nUser question: {message_in_english}"
-            gemini_response = get_gemini_response(gemini_prompt, conversation_history=conversation_history)
-            response = get_groq_summary(gemini_response) or gemini_response
+            gemini_response = await get_gemini_response(gemini_prompt, conversation_history=conversation_history, reply_language=user_lang)
+            response = await maybe_summarize(gemini_response) or baseline_response
         else:
             logger.warning("Perplexity search failed. Falling back to Gemini directly.")
-            response = get_gemini_response(message_in_english, conversation_history=conversation_history)
+            response = baseline_response or await get_gemini_response(message_in_english, conversation_history=conversation_history, reply_language=user_lang)
     else: # reason_only
-        gemini_response = get_gemini_response(message_in_english, conversation_history=conversation_history)
-        response = get_groq_summary(gemini_response) or gemini_response
-        
-    logger.info(f"Generated final response for user in English.")
+        gemini_response = draft_response or await get_gemini_response(message_in_english, conversation_history=conversation_history, reply_language=user_lang)
+        response = await maybe_summarize(gemini_response)
+        if cache_key and gemini_model and response:
+            await asyncio.to_thread(cache_response, cache_key, response)
+
+    if not response:
+        logger.warning("No provider produced a response; sending the fallback message.")
+        return FALLBACK_RESPONSE
+    logger.info("Generated final response for user in '%s'.", user_lang)
     return response
 
+class RateLimiter:
+    """Token bucket shared by every sender thread in this process."""
+
+    def __init__(self, rate, burst=None):
+        self.rate = rate
+        self.burst = burst or max(1, int(rate))
+        self._tokens = float(self.burst)
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Take one token, sleeping until it is available. Callers reserve their
+        slot under the lock, so concurrent senders are spaced out rather than
+        all waking at once."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._last) * self.rate)
+            self._last = now
+            self._tokens -= 1
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0
+        if wait:
+            time.sleep(wait)
+
+_send_limiter = RateLimiter(Config.SEND_RATE_LIMIT)
+SEND_MAX_RETRIES = 3
+
+MAX_MESSAGE_LENGTH = 1600  # Twilio's limit for WhatsApp messages
+PART_PREFIX_ROOM = "(99/99) "
+
+# Preferred places to split a long reply, best first. Sentence ends include
+# the Devanagari danda, since many replies are in Hindi.
+SPLIT_BOUNDARIES = (('\n\n',), ('\n',), ('. ', '! ', '? ', '\u0964 '), (' ',))
+
+def utf16_len(text):
+    """Length as WhatsApp counts it: UTF-16 code units, not code points."""
+    return len(text.encode('utf-16-le')) // 2
+
+def split_message(text, limit):
+    """Split text into pieces of at most limit UTF-16 units, cutting at the
+    best boundary in the second half of each piece, else mid-word."""
+    pieces = []
+    while utf16_len(text) > limit:
+        units = 0
+        for cut, char in enumerate(text):
+            units += 2 if ord(char) > 0xFFFF else 1
+            if units > limit:
+                break
+        window = text[:cut]
+        for separators in SPLIT_BOUNDARIES:
+            end = max(window.rfind(sep) + len(sep) if sep in window else -1 for sep in separators)
+            if end > cut // 2:
+                cut = end
+                break
+        pieces.append(text[:cut].rstrip())
+        text = text[cut:].lstrip()
+    if text.strip():
+        pieces.append(text.rstrip())
+    return pieces
+
+# Separate from the webhook pool, so a worker waiting on its parts can never
+# be stuck behind its own queued sends
+_send_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix='wa-send')
+atexit.register(_send_executor.shutdown)
+
 def send_whatsapp_message(to_phone, message_body):
-    if not twilio_client:
+    return send_message_parts(to_phone, message_body)[0]
+
+def send_message_parts(to_phone, message_body, sent_parts=0):
+    """Send the parts of message_body not yet set in the sent_parts bitmask
+    (bit i is part i + 1). Returns (fully delivered, updated bitmask), so a
+    retry of a partly delivered reply does not repeat what already arrived."""
+    if not twilio_messages_url:
         logger.error("Cannot send message, Twilio client not initialized.")
-        return False
-    
-    # Send message as is, since AI should generate responses within character limits
-    max_length = 1600  # Twilio's limit for WhatsApp messages
-    
-    # If message is within limit, send as is
-    if len(message_body) <= max_length:
-        logger.info(f"Attempting to send message to {to_phone} via Twilio...")
+        return False, sent_parts
+
+    # The AI is asked to stay under the limit, but when a reply runs over it is
+    # sent in parts rather than dropped.
+    if utf16_len(message_body) <= MAX_MESSAGE_LENGTH:
+        parts = [message_body]
+    else:
+        chunks = split_message(message_body, MAX_MESSAGE_LENGTH - len(PART_PREFIX_ROOM))
+        parts = [f"({n}/{len(chunks)}) {chunk}" for n, chunk in enumerate(chunks, 1)]
+        logger.info("Message length %s exceeds %s; sending %s parts.", len(message_body), MAX_MESSAGE_LENGTH, len(parts))
+    pending = [i for i in range(len(parts)) if not sent_parts >> i & 1]
+    # The first part goes out on its own so the reply starts with it; the rest
+    # are posted concurrently and their "(n/N)" prefixes keep them readable if
+    # WhatsApp shows them out of order.
+    if pending:
+        if not _send_part(to_phone, parts[pending[0]]):
+            return False, sent_parts
+        sent_parts |= 1 << pending[0]
+        rest = pending[1:]
+        for i, sent in zip(rest, _send_executor.map(_send_part, [to_phone] * len(rest), [parts[i] for i in rest])):
+            if sent:
+                sent_parts |= 1 << i
+    return sent_parts == (1 << len(parts)) - 1, sent_parts
+
+def _send_part(to_phone, message_body):
+    logger.info("Attempting to send message to %s via Twilio...", to_phone)
+    for attempt in range(SEND_MAX_RETRIES + 1):
+        _send_limiter.acquire()
         try:
-            message = twilio_client.messages.create(
-                from_=Config.TWILIO_PHONE_NUMBER,
-                body=message_body,
-                to=to_phone
+            response = _http.post(
+                twilio_messages_url,
+                auth=(Config.TWILIO_ACCOUNT_SID, Config.TWILIO_AUTH_TOKEN),
+                data={'From': Config.TWILIO_PHONE_NUMBER, 'To': to_phone, 'Body': message_body}
             )
-            logger.info(f"Message sent successfully to {to_phone} (SID: {message.sid})")
-            return True
         except Exception as e:
-            logger.error(f"Failed to send Twilio message: {e}")
+            logger.error("Failed to send Twilio message: %s", e)
             return False
-    
-    # If message exceeds limit, log error and don't send
-    logger.error(f"Message length {len(message_body)} exceeds limit of {max_length} characters. Message not sent.")
+        if response.is_success:
+            logger.info("Message sent successfully to %s (SID: %s)", to_phone, response.json().get('sid'))
+            return True
+        if response.status_code == 429 and attempt < SEND_MAX_RETRIES:
+            delay = float(response.headers.get('Retry-After', 2 ** attempt))
+            logger.warning("Twilio rate limited the send to %s; retrying in %ss.", to_phone, delay)
+            time.sleep(delay)
+            continue
+        logger.error("Twilio API returned status %s: %s", response.status_code, response.text)
+        return False
     return False
 
+# --- Outbox ---
+# Replies are recorded in pending_sends before the first delivery attempt, so a
+# network blip, a provider error or a worker crash mid-send does not lose them.
+# A row stays leased for OUTBOX_LEASE_SECONDS while someone is sending it;
+# after that the delivery loop (in any worker) retries it with exponential
+# backoff. The conversation is saved once delivery succeeds.
+OUTBOX_POLL_INTERVAL = 5
+OUTBOX_LEASE_SECONDS = 60
+OUTBOX_MAX_ATTEMPTS = 5
+OUTBOX_BATCH_SIZE = 100
+
+def enqueue_send(user_phone, body, user_message, language):
+    """Record a reply in the outbox, leased to the caller for its first attempt."""
+    with _db_write_lock:
+        cursor = _db_conn.execute(
+            "INSERT INTO pending_sends (phone, body, message, language, attempts, next_try_at) VALUES (?, ?, ?, ?, 0, ?)",
+            (user_phone, body, user_message, language, time.time() + OUTBOX_LEASE_SECONDS))
+        return cursor.lastrowid
+
+def deliver_send(send_id, user_phone, body, user_message, language, attempts, sent_parts=0):
+    """Attempt one delivery of an outbox row, then delete it or schedule a retry."""
+    delivered, sent_parts = send_message_parts(user_phone, body, sent_parts)
+    if delivered:
+        save_conversation(user_phone, user_message, body, language, send_id)
+        return True
+    attempts += 1
+    with _db_write_lock:
+        if attempts >= OUTBOX_MAX_ATTEMPTS:
+            _db_conn.execute("DELETE FROM pending_sends WHERE id = ?", (send_id,))
+            logger.error("Giving up on reply to %s after %s attempts.", user_phone, attempts)
+        else:
+            _db_conn.execute("UPDATE pending_sends SET attempts = ?, next_try_at = ?, sent_parts = ? WHERE id = ?",
+                             (attempts, time.time() + 2 ** attempts, sent_parts, send_id))
+            logger.warning("Delivery to %s failed; retry %s scheduled in %ss.", user_phone, attempts, 2 ** attempts)
+    return False
+
+def _claim_due_sends():
+    now = time.time()
+    with _db_write_lock:
+        _db_conn.execute("BEGIN IMMEDIATE")
+        try:
+            rows = _db_conn.execute(
+                "SELECT id, phone, body, message, language, attempts, sent_parts FROM pending_sends WHERE next_try_at <= ? ORDER BY next_try_at LIMIT ?",
+                (now, OUTBOX_BATCH_SIZE)).fetchall()
+            _db_conn.executemany("UPDATE pending_sends SET next_try_at = ? WHERE id = ?",
+                                 [(now + OUTBOX_LEASE_SECONDS, row[0]) for row in rows])
+            _db_conn.execute("COMMIT")
+        except Exception:
+            _db_conn.execute("ROLLBACK")
+            raise
+    return rows
+
+def _outbox_loop():
+    next_prune = 0
+    while True:
+        time.sleep(OUTBOX_POLL_INTERVAL)
+        if time.monotonic() >= next_prune:
+            next_prune = time.monotonic() + CACHE_PRUNE_INTERVAL
+            try:
+                prune_expired_caches()
+            except Exception as e:
+                logger.error("Error pruning caches: %s", e)
+        try:
+            rows = _claim_due_sends()
+        except Exception as e:
+            logger.error("Error reading outbox: %s", e)
+            continue
+        if rows:
+            logger.info("Retrying %s pending send(s) from the outbox.", len(rows))
+        for row in rows:
+            try:
+                deliver_send(*row)
+            except Exception as e:
+                logger.error("Error delivering outbox message %s: %s", row[0], e)
+
+Thread(target=_outbox_loop, name='outbox', daemon=True).start()
+
+async def prepare_query(user_phone, user_message):
+    """Concurrently load history, translate the message and prefetch search results.
+
+    The Perplexity search only depends on the user's text, so when the raw
+    message already reads as a search query it is started alongside the
+    translation instead of after it.
+
+    Returns (history, translation_result, search_task, draft_response), where
+    search_task is the still-running search or None if none was started. When
+    the message needs a Gemini translation anyway, the translation and a draft
+    answer come from one fused call instead of two sequential ones.
+    """
+    strategy = determine_response_strategy(user_message)
+    fuse = (strategy == 'reason_only' and detect_language(user_message) != 'en'
+            and (user_message, "English") not in _translation_cache)
+    if fuse and len(user_message) <= TRANSLATION_CACHE_MAX_TEXT:
+        # A stored translation (e.g. from before a restart) makes the separate
+        # path cheap, and lets process_health_query reach the response cache
+        # before any answer is paid for.
+        stored = await asyncio.to_thread(get_stored_translation, user_message, "English")
+        if stored:
+            remember_translation(user_message, "English", stored)
+            fuse = False
+    if fuse:
+        conversation_history = await asyncio.to_thread(get_recent_conversations, user_phone, 30)
+        fused = await get_fused_response(user_message, conversation_history)
+        if fused:
+            translation_result = {"detected_language": fused['detected_language'],
+                                  "translated_text": fused['english_question']}
+            if len(user_message) <= TRANSLATION_CACHE_MAX_TEXT:
+                remember_translation(user_message, "English", translation_result)
+                _loop.run_in_executor(None, store_translation, user_message, "English", translation_result)
+            return conversation_history, translation_result, None, fused['answer']
+        return conversation_history, await translate_to_english(user_message), None, None
+
+    # The search is handed on unawaited, so process_health_query decides how
+    # long to wait for it and can tell "failed" apart from "never started".
+    search_task = None
+    if strategy == 'search_and_reason':
+        search_task = asyncio.ensure_future(get_perplexity_search(user_message))
+    conversation_history, translation_result = await asyncio.gather(
+        asyncio.to_thread(get_recent_conversations, user_phone, 30),
+        translate_to_english(user_message),
+    )
+    return conversation_history, translation_result, search_task, None
+
 def process_message_background(user_phone, user_message):
-    logger.info(f"Starting background processing for user {user_phone}.")
+    logger.info("Starting background processing for user %s.", user_phone)
     try:
-        # 1. Get recent conversation history
-        conversation_history = get_recent_conversations(user_phone, limit=30)
-        
-        # 2. Translate user message to English and detect their language
-        translation_result = translate_with_gemini(user_message, "English")
+        # 1-2. Get recent conversation history and translate the user message to
+        # English (detecting their language), overlapping the network calls
+        conversation_history, translation_result, search_task, draft_response = run_async(prepare_query(user_phone, user_message))
         english_message = translation_result['translated_text']
         user_lang = translation_result['detected_language']
-        logger.info(f"User language is '{user_lang}', translated message is '{english_message}'")
+        logger.info("User language is '%s', translated message is '%s'", user_lang, english_message)
 
-        # 3. Process the query in English to get the core response, using conversation history
-        response_in_english = process_health_query(english_message, user_phone, conversation_history)
+        # 3. Process the query in English, with Gemini writing the answer in the
+        # user's language, using conversation history
+        final_response = run_async(process_health_query(english_message, user_phone, conversation_history, search_task, user_lang, draft_response))
 
-        # 4. Keep response simple
-        full_response_in_english = response_in_english
+        # 4. Only the fixed emergency and fallback texts still need translating
+        if final_response in CANNED_RESPONSES:
+            final_response = run_async(get_canned_response(final_response, user_lang))
 
-        # 5. Translate the full response back to the user's language
-        final_translation_result = translate_with_gemini(full_response_in_english, user_lang)
-        final_response = final_translation_result['translated_text']
-        
-        # 6. Send and save
-        if send_whatsapp_message(user_phone, final_response):
+        # 5. Record in the outbox, then send and save
+        try:
+            send_id = enqueue_send(user_phone, final_response, user_message, user_lang)
+        except Exception as e:
+            logger.error("Error writing outbox, sending without retry: %s", e)
+            send_id = None
+        if send_id is not None:
+            if not deliver_send(send_id, user_phone, final_response, user_message, user_lang, 0):
+                logger.error("Failed to send final response to %s; it will be retried.", user_phone)
+        elif send_whatsapp_message(user_phone, final_response):
             save_conversation(user_phone, user_message, final_response, user_lang)
         else:
-            logger.error(f"Failed to send final response to {user_phone}.")
+            logger.error("Failed to send final response to %s.", user_phone)
     except Exception as e:
-        logger.error(f"Unhandled exception in background processor: {e}")
-    logger.info(f"Finished background processing for {user_phone}.")
+        logger.error("Unhandled exception in background processor: %s", e)
+    logger.info("Finished background processing for %s.", user_phone)
+
+# Bounded pool for inbound message processing; reuses threads instead of
+# spawning one per webhook and caps concurrency during bursts.
+_executor = ThreadPoolExecutor(max_workers=Config.WORKER_THREADS, thread_name_prefix='wa-bg')
+atexit.register(_executor.shutdown)
+
+# Jobs submitted but not yet finished, so a backlog behind stalled LLM calls
+# shows up in the logs instead of silently growing the executor queue.
+_jobs_in_flight = 0
+_jobs_lock = threading.Lock()
+
+def _job_done(_future):
+    global _jobs_in_flight
+    with _jobs_lock:
+        _jobs_in_flight -= 1
+
+# Users often type one question as several quick fragments. Fragments from the
+# same number are buffered until MESSAGE_DEBOUNCE_SECONDS pass without a new
+# one, then answered with a single pipeline run. The buffer and its timers live
+# on the event loop thread, so no lock is needed.
+_pending_messages = {}
+
+def _flush_user(user_phone):
+    global _jobs_in_flight
+    fragments, _ = _pending_messages.pop(user_phone)
+    with _jobs_lock:
+        _jobs_in_flight += 1
+        backlog = _jobs_in_flight - Config.WORKER_THREADS
+    _executor.submit(process_message_background, user_phone, ' '.join(fragments)).add_done_callback(_job_done)
+    logger.info("Queued background processing for %s (%s message(s)).", user_phone, len(fragments))
+    if backlog > 0:
+        logger.warning("All %s workers busy; %s message(s) waiting.", Config.WORKER_THREADS, backlog)
+
+def _buffer_message(user_phone, user_message):
+    fragments, timer = _pending_messages.get(user_phone, ([], None))
+    if timer:
+        timer.cancel()
+    fragments.append(user_message)
+    # Never hold back an emergency while waiting for more fragments.
+    if Config.MESSAGE_DEBOUNCE_SECONDS <= 0 or EMERGENCY_KEYWORDS_RE.search(user_message):
+        _pending_messages[user_phone] = (fragments, None)
+        _flush_user(user_phone)
+    else:
+        timer = _loop.call_later(Config.MESSAGE_DEBOUNCE_SECONDS, _flush_user, user_phone)
+        _pending_messages[user_phone] = (fragments, timer)
 
 # --- Flask Routes ---
 @app.route('/webhook', methods=['POST'])
@@ -381,19 +1225,17 @@ def handle_twilio_webhook():
     """Handles incoming messages from Twilio."""
     logger.info("Received request on /webhook")
     try:
-        data = request.values
-        user_message = data.get('Body', '').strip()
-        user_phone = data.get('From', '')
+        # Twilio posts form fields only, so skip merging in the query string
+        user_message = request.form.get('Body', '').strip()
+        user_phone = request.form.get('From', '')
         
-        logger.info(f"Parsed message from {user_phone}: '{user_message}'")
+        logger.info("Parsed message from %s: '%s'", user_phone, user_message)
         
         if user_message and user_phone:
-            thread = Thread(target=process_message_background, args=(user_phone, user_message))
-            thread.start()
-            logger.info(f"Started background thread for {user_phone}.")
+            _loop.call_soon_threadsafe(_buffer_message, user_phone, user_message)
             
     except Exception as e:
-        logger.error(f"Error in Twilio webhook handler: {e}")
+        logger.error("Error in Twilio webhook handler: %s", e)
         
     return ('', 204) # Return a 204 No Content to acknowledge receipt
 
@@ -404,5 +1246,6 @@ def health_check():
 if __name__ == '__main__':
     logger.info("Starting Flask application...")
     init_db()
+    warm_up_clients()
     port = int(os.environ.get('PORT', 5000))
     app.run(host='0.0.0.0', port=port, debug=False)
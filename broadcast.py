@@ -1,6 +1,9 @@
 import os
 import requests
 import logging
+import orjson
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from dotenv import load_dotenv
 
 # Load environment variables from .env file for local testing
@@ -16,6 +19,19 @@ WHATSAPP_TOKEN = os.environ.get('WHATSAPP_TOKEN')
 WHATSAPP_PHONE_NUMBER_ID = os.environ.get('WHATSAPP_PHONE_NUMBER_ID')
 RECIPIENT_PHONE_NUMBER = "918273707186" # Default number for the broadcast
 
+# Shared session so repeated sends reuse the TLS connection to the Graph API
+# instead of paying a fresh handshake per message. Only failed connects are
+# retried: the request never left, so no message can be sent twice.
+http_session = requests.Session()
+http_session.mount('https://', HTTPAdapter(
+    pool_connections=16,
+    pool_maxsize=64,
+    max_retries=Retry(total=3, connect=3, read=False, status=False, backoff_factor=0.2)
+))
+http_session.headers.update({"Content-Type": "application/json", "Connection": "keep-alive"})
+# (connect, read) timeouts so a stalled Graph API call can't hang the sender
+HTTP_TIMEOUT = (3.05, 30)
+
 def send_whatsapp_message(to_phone, message):
     """Sends a single WhatsApp message."""
     if not all([WHATSAPP_TOKEN, WHATSAPP_PHONE_NUMBER_ID]):
@@ -23,17 +39,15 @@ def send_whatsapp_message(to_phone, message):
         return False
     try:
         url = f"https://graph.facebook.com/v20.0/{WHATSAPP_PHONE_NUMBER_ID}/messages"
-        headers = {
-            "Authorization": f"Bearer {WHATSAPP_TOKEN}",
-            "Content-Type": "application/json"
-        }
+        headers = {"Authorization": f"Bearer {WHATSAPP_TOKEN}"}
         data = {
             "messaging_product": "whatsapp",
             "to": to_phone,
             "type": "text",
             "text": {"body": message}
         }
-        response = requests.post(url, headers=headers, json=data)
+        # Content-Type is preset on the session, so send pre-encoded bytes
+        response = http_session.post(url, headers=headers, data=orjson.dumps(data), timeout=HTTP_TIMEOUT)
         if response.status_code == 200:
             logger.info(f"Message sent successfully to {to_phone}")
             return True
@@ -0,0 +1,180 @@
+import os
+import logging
+import threading
+from functools import cache
+
+# pysqlite3-binary, if installed, bundles a current SQLite; distro builds can
+# predate STRICT tables and carry older query planners.
+try:
+    import pysqlite3 as sqlite3
+except ImportError:
+    import sqlite3
+
+logger = logging.getLogger(__name__)
+
+# Shared SQLite schema and connection setup for app.py, minimal_app.py and
+# simple_app.py, so every entry point creates the same tables and indexes.
+DEFAULT_DATABASE_URL = 'sqlite:///health_bot.db'
+
+@cache
+def database_path():
+    """File named by DATABASE_URL (sqlite:///<path>). Read on first connect,
+    after the entry point has loaded .env, and reused from then on."""
+    url = os.environ.get('DATABASE_URL') or DEFAULT_DATABASE_URL
+    if not url.startswith('sqlite:///'):
+        raise ValueError(f"DATABASE_URL must be a sqlite:/// URL, got {url!r}")
+    return url.removeprefix('sqlite:///')
+
+# Applied to every connection we open. page_size only takes effect on a fresh
+# file, so it goes first. WAL lets readers proceed while the single writer
+# commits (checkpointing every 1000 pages keeps the -wal file bounded),
+# busy_timeout queues instead of failing with "database is locked"
+# under bursty traffic, and mmap serves page reads without read() syscalls.
+SQLITE_PRAGMAS = (
+    "PRAGMA page_size=8192",
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA wal_autocheckpoint=1000",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA busy_timeout=5000",
+    "PRAGMA cache_size=-65536",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA mmap_size=268435456",
+)
+
+# STRICT tables (SQLite 3.37+) store values exactly as declared instead of
+# applying type affinity on every write, and reject a wrongly typed value
+# rather than storing it silently. Older libraries get plain tables.
+STRICT = sqlite3.sqlite_version_info >= (3, 37, 0)
+
+def table_options(*options):
+    """Join CREATE TABLE options, adding STRICT where the library supports it."""
+    return ', '.join(options + ('STRICT',) * STRICT)
+
+SCHEMA = (
+    f'''
+    CREATE TABLE IF NOT EXISTS conversations (
+        id INTEGER PRIMARY KEY, user_phone TEXT NOT NULL,
+        message TEXT NOT NULL, response TEXT NOT NULL,
+        timestamp INTEGER NOT NULL DEFAULT (CAST(strftime('%s', 'now') AS INTEGER)), language TEXT DEFAULT 'en',
+        ai_service TEXT DEFAULT 'gemini'
+    ) {table_options()}
+    ''',
+    f'''
+    CREATE TABLE IF NOT EXISTS user_profiles (
+        phone TEXT PRIMARY KEY, name TEXT, preferred_language TEXT DEFAULT 'en',
+        health_conditions TEXT, created_at INTEGER DEFAULT (CAST(strftime('%s', 'now') AS INTEGER)),
+        last_active INTEGER DEFAULT (CAST(strftime('%s', 'now') AS INTEGER))
+    ) {table_options('WITHOUT ROWID')}
+    ''',
+    f'''
+    CREATE TABLE IF NOT EXISTS response_cache (
+        key TEXT PRIMARY KEY, response TEXT NOT NULL, created_at REAL NOT NULL
+    ) {table_options()}
+    ''',
+    f'''
+    CREATE TABLE IF NOT EXISTS translation_cache (
+        key TEXT PRIMARY KEY, detected_language TEXT NOT NULL,
+        translated_text TEXT NOT NULL, created_at REAL NOT NULL
+    ) {table_options()}
+    ''',
+    f'''
+    CREATE TABLE IF NOT EXISTS pending_sends (
+        id INTEGER PRIMARY KEY, phone TEXT NOT NULL, body TEXT NOT NULL,
+        message TEXT NOT NULL, language TEXT DEFAULT 'en',
+        attempts INTEGER NOT NULL DEFAULT 0, next_try_at REAL NOT NULL
+    ) {table_options()}
+    ''',
+    "CREATE INDEX IF NOT EXISTS idx_conv_user_ts ON conversations(user_phone, timestamp DESC)",
+    "CREATE INDEX IF NOT EXISTS idx_pending_sends_next_try ON pending_sends(next_try_at)",
+)
+
+# One-time migrations. Entry n brings a database to PRAGMA user_version n + 1.
+# Each runs once, after the schema, so later startups skip the table scans.
+# Columns added here are left out of SCHEMA: a fresh database gets them from
+# its migration like any other.
+MIGRATIONS = (
+    # Databases created before timestamps became unix epoch seconds still hold
+    # 'YYYY-MM-DD HH:MM:SS' text; convert it so ordering never mixes the two.
+    (
+        "UPDATE conversations SET timestamp = CAST(strftime('%s', timestamp) AS INTEGER) WHERE typeof(timestamp) = 'text'",
+        "UPDATE user_profiles SET created_at = CAST(strftime('%s', created_at) AS INTEGER) WHERE typeof(created_at) = 'text'",
+        "UPDATE user_profiles SET last_active = CAST(strftime('%s', last_active) AS INTEGER) WHERE typeof(last_active) = 'text'",
+    ),
+    # Bitmask of the parts of a multi-part reply already delivered (bit i is
+    # part i + 1), so a retry only sends what is missing.
+    (
+        "ALTER TABLE pending_sends ADD COLUMN sent_parts INTEGER NOT NULL DEFAULT 0",
+    ),
+)
+
+def connect_db():
+    """Open a connection to the bot database with the standard PRAGMAs applied."""
+    conn = sqlite3.connect(database_path(), check_same_thread=False, isolation_level=None)
+    for pragma in SQLITE_PRAGMAS:
+        conn.execute(pragma)
+    return conn
+
+# Readers keep one connection per thread instead of reconnecting per query, so
+# the page cache and mmap stay warm. Under WAL they never block the writer.
+_read_local = threading.local()
+
+def get_read_conn():
+    """Return this thread's read connection, opening it on first use."""
+    conn = getattr(_read_local, 'conn', None)
+    if conn is None:
+        init_db()
+        conn = _read_local.conn = connect_db()
+        # Reads only: a stray write here would bypass the writer's lock.
+        conn.execute("PRAGMA query_only=1")
+    return conn
+
+def apply_migrations(conn):
+    """Run the MIGRATIONS this database has not had yet, in one transaction.
+    user_version is read under the write lock, so when workers start together
+    only the first applies a migration and the rest see it already done."""
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
+        for migration in MIGRATIONS[version:]:
+            for statement in migration:
+                conn.execute(statement)
+        conn.execute(f"PRAGMA user_version = {max(version, len(MIGRATIONS))}")
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+
+def create_schema(conn):
+    """Create all tables and indexes on an autocommit connection as one script
+    and one transaction, then apply any pending MIGRATIONS."""
+    # IMMEDIATE takes the write lock up front, so workers starting together
+    # queue on busy_timeout instead of failing to upgrade a read lock.
+    try:
+        conn.executescript("BEGIN IMMEDIATE;\n" + ";\n".join(SCHEMA) + ";\nCOMMIT;")
+    except Exception:
+        if conn.in_transaction:
+            conn.execute("ROLLBACK")
+        raise
+    if conn.execute("PRAGMA user_version").fetchone()[0] < len(MIGRATIONS):
+        apply_migrations(conn)
+    # Copy everything into the main file and truncate the -wal, so each run
+    # starts with an empty log instead of one left over from the last.
+    conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+# Entry points call this at startup, and the first read connection calls it
+# too, so a route served before startup finished still finds its tables.
+@cache
+def init_db():
+    """Create the schema once per process; repeat calls return immediately."""
+    logger.info("Initializing database...")
+    conn = connect_db()
+    try:
+        # journal_mode silently stays 'delete' on filesystems without shared
+        # memory support, so check once rather than assume WAL is on.
+        mode = conn.execute("PRAGMA journal_mode").fetchone()[0]
+        if mode != 'wal':
+            logger.warning("SQLite is in %s journal mode, not WAL; readers will block on writes", mode)
+        create_schema(conn)
+    finally:
+        conn.close()
+    logger.info("Database initialized successfully.")
@@ -0,0 +1,29 @@
+import os
+
+# Gunicorn settings for the Twilio webhook app.
+#
+# The webhook only parses the form and hands work to the app's own thread
+# pool, so threaded workers are enough. gevent is deliberately not used: its
+# monkey-patching would interfere with the asyncio loop thread and the SQLite
+# flusher thread that app.py runs.
+#
+# One worker by default: each one costs ~130 MB after importing app.py, and
+# the debounce buffer, translation cache, in-flight coalescing and send rate
+# limiter are all per process, so a user's fragments must reach the same one.
+# Concurrency comes from the threads. WEB_CONCURRENCY still overrides this.
+bind = f"0.0.0.0:{os.environ.get('PORT', 5000)}"
+workers = int(os.environ.get('WEB_CONCURRENCY', 1))
+worker_class = 'gthread'
+threads = int(os.environ.get('GUNICORN_THREADS', 8))
+timeout = 60
+keepalive = 5
+
+# app.py starts background threads at import time, which do not survive a
+# fork, so the app must be loaded inside each worker rather than preloaded.
+preload_app = False
+
+def post_worker_init(worker):
+    # `python app.py` runs these itself; under gunicorn nothing else does.
+    from app import init_db, warm_up_clients
+    init_db()
+    warm_up_clients()
@@ -1,19 +1,21 @@
 import os
-import json
 import logging
+import orjson
 from datetime import datetime
 from flask import Flask, request, jsonify
 from dotenv import load_dotenv
-import sqlite3
+from db import get_read_conn, init_db
+from json_provider import OrjsonProvider
 
 # Load environment variables
 load_dotenv()
 
 # Configure logging
-logging.basicConfig(level=logging.INFO)
+logging.basicConfig(level=os.environ.get('LOG_LEVEL', 'INFO').upper())
 logger = logging.getLogger(__name__)
 
 app = Flask(__name__)
+app.json = OrjsonProvider(app)
 
 # Configuration
 class Config:
@@ -28,37 +30,6 @@ class Config:
 
 app.config.from_object(Config)
 
-# Initialize database
-def init_db():
-    conn = sqlite3.connect('health_bot.db')
-    cursor = conn.cursor()
-    
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS conversations (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_phone TEXT NOT NULL,
-            message TEXT NOT NULL,
-            response TEXT NOT NULL,
-            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
-            language TEXT DEFAULT 'en',
-            ai_service TEXT DEFAULT 'gemini'
-        )
-    ''')
-    
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS user_profiles (
-            phone TEXT PRIMARY KEY,
-            name TEXT,
-            preferred_language TEXT DEFAULT 'en',
-            health_conditions TEXT,
-            created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-            last_active DATETIME DEFAULT CURRENT_TIMESTAMP
-        )
-    ''')
-    
-    conn.commit()
-    conn.close()
-
 # Flask routes
 @app.route('/webhook', methods=['GET'])
 def verify_webhook():
@@ -79,40 +50,43 @@ def verify_webhook():
 @app.route('/webhook', methods=['POST'])
 def handle_webhook():
     try:
-        data = request.get_json()
-        logger.info(f"Received webhook data: {data}")
+        # Parse the body exactly once; Meta always posts JSON, so skip the
+        # content-type check and don't keep a cached copy on the request.
+        data = request.get_json(cache=False, force=True, silent=True)
+        if data is None:
+            logger.warning("Received webhook with an empty or invalid JSON body")
+        elif logger.isEnabledFor(logging.INFO):
+            logger.info("Received webhook data: %s", orjson.dumps(data).decode())
         
-        # Just acknowledge the message for now
+        # Always acknowledge promptly; Meta redelivers anything that isn't a 200.
         return "OK", 200
         
     except Exception as e:
-        logger.error(f"Error handling webhook: {e}")
+        logger.error("Error handling webhook: %s", e)
         return "Error", 500
 
+# Everything but the timestamp is fixed for the life of the process, so
+# serialize it once and splice the timestamp in per probe.
+_HEALTH_PREFIX = orjson.dumps({
+    "status": "healthy",
+    "services": {
+        "whatsapp": bool(Config.WHATSAPP_TOKEN),
+        "app": "running"
+    }
+})[:-1] + b',"timestamp":'
+
 @app.route('/health', methods=['GET'])
 def health_check():
-    return jsonify({
-        "status": "healthy",
-        "timestamp": datetime.now().isoformat(),
-        "services": {
-            "whatsapp": bool(Config.WHATSAPP_TOKEN),
-            "app": "running"
-        }
-    })
+    body = _HEALTH_PREFIX + orjson.dumps(datetime.now().isoformat()) + b'}'
+    return app.response_class(body, mimetype='application/json')
 
 @app.route('/stats', methods=['GET'])
 def get_stats():
     try:
-        conn = sqlite3.connect('health_bot.db')
-        cursor = conn.cursor()
-        
-        cursor.execute('SELECT COUNT(*) FROM conversations')
-        total_conversations = cursor.fetchone()[0]
-        
-        cursor.execute('SELECT COUNT(DISTINCT user_phone) FROM conversations')
-        unique_users = cursor.fetchone()[0]
-        
-        conn.close()
+        # Both counts come from one pass over the covering idx_conv_user_ts index
+        total_conversations, unique_users = get_read_conn().execute(
+            'SELECT COUNT(*), COUNT(DISTINCT user_phone) FROM conversations'
+        ).fetchone()
         
         return jsonify({
             "total_conversations": total_conversations,
@@ -121,7 +95,7 @@ def get_stats():
         })
         
     except Exception as e:
-        logger.error(f"Error getting stats: {e}")
+        logger.error("Error getting stats: %s", e)
         return jsonify({"error": "Unable to fetch stats"}), 500
 
 if __name__ == '__main__':